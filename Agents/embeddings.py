@@ -0,0 +1,23 @@
+"""
+Agents/embeddings.py
+
+Shared OpenAI embedding helper for the policy answer cache and the intent router,
+so both always use the same model and normalization.
+"""
+
+import os
+import numpy as np
+from openai import OpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def embed_texts(texts):
+    """Embed texts and return unit-length rows, so dot products are cosine similarities."""
+    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=list(texts))
+    vecs = np.asarray([d.embedding for d in resp.data], dtype=np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
@@ -0,0 +1,36 @@
+"""
+Agents/intent_router.py
+
+Embedding fallback for routing queries the keyword regexes in main.py miss
+(e.g. "CV review", "holiday rules"). Each mode has a short prototype phrase;
+a query goes to the mode whose prototype embedding is most similar to it.
+
+Usage:
+- build the label matrix once (main.py caches it with st.cache_resource)
+- call `classify_intent(query, label_embeddings)` -> "resume" | "policy" | "onboarding" | "unknown"
+"""
+
+import numpy as np
+from Agents.embeddings import embed_texts
+
+MIN_SCORE = 0.35  # below this cosine similarity the query stays "unknown"
+
+INTENT_PROTOTYPES = {
+    "resume": "screen resumes CV candidates",
+    "policy": "HR policy leave payroll vacation rules",
+    "onboarding": "onboarding orientation joining welcome new hire",
+}
+
+
+def build_label_embeddings():
+    """(3, D) matrix of prototype embeddings, in INTENT_PROTOTYPES order."""
+    return embed_texts(INTENT_PROTOTYPES.values())
+
+
+def classify_intent(query, label_embeddings):
+    """Nearest prototype by cosine similarity, or "unknown" if nothing is close enough."""
+    scores = label_embeddings @ embed_texts([query])[0]
+    best = int(np.argmax(scores))
+    if scores[best] < MIN_SCORE:
+        return "unknown"
+    return list(INTENT_PROTOTYPES)[best]
@@ -23,48 +23,66 @@ import os
 import re
 import smtplib
 import json
+import time
+import asyncio
+import threading
 import traceback
-from typing import List, Dict, Optional
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional
+from email.message import EmailMessage
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize OpenAI client (if available)
-client = None
-if OPENAI_KEY:
-    client = OpenAI(api_key=OPENAI_KEY)
+# Max onboarding plans requested from OpenAI at the same time
+PLAN_CONCURRENCY = 10
 
 
 # -------------------------
 # Utilities
 # -------------------------
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9.\-_+]+@[a-zA-Z0-9\-_]+\.[a-zA-Z0-9.\-_]+")
+_USERNAME_STRIP_RE = re.compile(r"[^a-zA-Z0-9\-_]")
+
+
 def extract_email_from_text(text: str) -> Optional[str]:
     """Find first email in a blob of text, or None."""
     if not text:
         return None
-    m = re.search(r"[a-zA-Z0-9.\-_+]+@[a-zA-Z0-9\-_]+\.[a-zA-Z0-9.\-_]+", text)
+    m = _EMAIL_RE.search(text)
     return m.group(0) if m else None
 
 
 def guess_email_from_filename(filename: str, domain: str = "example.com") -> str:
     """If no email found, guess one using filename before first dot."""
     username = str(filename).split("@")[0].split(".")[0]
-    username = re.sub(r"[^a-zA-Z0-9\-_]", "", username).lower() or "candidate"
+    username = _USERNAME_STRIP_RE.sub("", username).lower() or "candidate"
     return f"{username}@{domain}"
 
 
 # -------------------------
 # OpenAI onboarding plan
 # -------------------------
-def generate_onboarding_plan_text(name: str, role: str, start_date: Optional[str] = None) -> str:
+def _fallback_plan(e: Exception) -> str:
+    """Safe template with an error note, used when the OpenAI call fails."""
+    return (f"(Could not generate plan via OpenAI: {e})\n\n" +
+            f"Day 1: Welcome, paperwork, access setup, team intro.\n"
+            "Day 2: Product overview, onboarding docs, basic training.\n"
+            "Day 3: Tools & environment setup, pairing with buddy.\n"
+            "Day 4: Role-specific training sessions.\n"
+            "Day 5: Meet cross-functional team, small task assigned.\n"
+            "Day 6: Feedback session, Q&A with manager.\n"
+            "Day 7: End-of-week review, next steps, goals.")
+
+
+async def generate_onboarding_plan_text(name: str, role: str, start_date: Optional[str] = None,
+                                        client: Optional[AsyncOpenAI] = None) -> str:
     """
     Generate a 7-day onboarding plan for the candidate using OpenAI.
-    If OpenAI not configured, returns a deterministic template.
+    If OpenAI not configured (no client), returns a deterministic template.
     """
     header = f"Onboarding Plan for {name} — {role}\n"
     if client is None:
@@ -101,14 +119,14 @@ Return plain text only.
     try:
         # Attempt new-style responses API; fallback to chat if needed
         try:
-            resp = client.responses.create(
+            resp = await client.responses.create(
                 model="gpt-4o-mini",
                 input=prompt,
                 temperature=0.3
             )
             text = resp.output_text
         except TypeError:
-            chat = client.chat.completions.create(
+            chat = await client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3
@@ -117,56 +135,187 @@ Return plain text only.
         return text.strip()
     except Exception as e:
         # On failure, return a safe template with an error note
-        return (f"(Could not generate plan via OpenAI: {e})\n\n" +
-                f"Day 1: Welcome, paperwork, access setup, team intro.\n"
-                "Day 2: Product overview, onboarding docs, basic training.\n"
-                "Day 3: Tools & environment setup, pairing with buddy.\n"
-                "Day 4: Role-specific training sessions.\n"
-                "Day 5: Meet cross-functional team, small task assigned.\n"
-                "Day 6: Feedback session, Q&A with manager.\n"
-                "Day 7: End-of-week review, next steps, goals.")
+        return _fallback_plan(e)
+
+
+async def generate_onboarding_plans(candidates: List[tuple], start_date: Optional[str] = None) -> List[str]:
+    """
+    Generate plans for (name, role) pairs concurrently (at most PLAN_CONCURRENCY in flight).
+    Returns plan texts in input order.
+    """
+    if not OPENAI_KEY:
+        return [await generate_onboarding_plan_text(name, role, start_date) for name, role in candidates]
+
+    sem = asyncio.Semaphore(PLAN_CONCURRENCY)
+    async with AsyncOpenAI(api_key=OPENAI_KEY) as client:
+        async def plan(name: str, role: str) -> str:
+            async with sem:
+                return await generate_onboarding_plan_text(name, role, start_date, client=client)
+
+        plans = await asyncio.gather(*(plan(name, role) for name, role in candidates), return_exceptions=True)
+    return [_fallback_plan(p) if isinstance(p, Exception) else p for p in plans]
 
 
 # -------------------------
 # SMTP Email sender
 # -------------------------
+class SMTPPool:
+    """
+    Reusable SMTP session: connects, runs STARTTLS and logs in once, then sends
+    any number of messages over the same connection. Reconnects if the server drops it.
+    Pulls defaults from environment if arguments not provided.
+    """
+
+    def __init__(self, smtp_host: Optional[str] = None, smtp_port: Optional[int] = None,
+                 smtp_user: Optional[str] = None, smtp_pass: Optional[str] = None,
+                 use_tls: bool = True):
+        self.smtp_host = smtp_host or os.getenv("SMTP_HOST")
+        self.smtp_port = int(smtp_port or os.getenv("SMTP_PORT", 587))
+        self.smtp_user = smtp_user or os.getenv("SMTP_USER")
+        self.smtp_pass = smtp_pass or os.getenv("SMTP_PASS")
+        self.use_tls = use_tls
+        self.server = None
+
+    def _connect(self):
+        self.close()
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=15)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.smtp_user and self.smtp_pass:
+                server.login(self.smtp_user, self.smtp_pass)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+
+    def send(self, msg: EmailMessage):
+        if self.server is None:
+            self._connect()
+        try:
+            try:
+                self.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # connection timed out / was dropped between sends — log in again once
+                self._connect()
+                self.server.send_message(msg)
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # the server answered (and smtplib reset the transaction), so the session is still usable
+            raise
+        except Exception:
+            # timeout / socket error mid-transaction leaves the protocol state unknown:
+            # drop the connection so the next send starts from a fresh login
+            self._drop()
+            raise
+
+    def _drop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
 def send_email_smtp(to_email: str, subject: str, body_text: str,
                     smtp_host: Optional[str] = None, smtp_port: Optional[int] = None,
                     smtp_user: Optional[str] = None, smtp_pass: Optional[str] = None,
-                    from_email: Optional[str] = None, use_tls: bool = True) -> Dict:
+                    from_email: Optional[str] = None, use_tls: bool = True,
+                    pool: Optional[SMTPPool] = None) -> Dict:
     """
     Send a plain-text onboarding email via SMTP.
-    Pulls defaults from environment if arguments not provided.
+    Pass an open SMTPPool to reuse one logged-in connection across many emails;
+    otherwise a one-off connection is made from the arguments / environment.
     Returns dict with status and message.
     """
+    owns_pool = pool is None
+    if owns_pool:
+        pool = SMTPPool(smtp_host, smtp_port, smtp_user, smtp_pass, use_tls)
+    from_email = from_email or os.getenv("FROM_EMAIL") or pool.smtp_user
 
-    smtp_host = smtp_host or os.getenv("SMTP_HOST")
-    smtp_port = int(smtp_port or os.getenv("SMTP_PORT", 587))
-    smtp_user = smtp_user or os.getenv("SMTP_USER")
-    smtp_pass = smtp_pass or os.getenv("SMTP_PASS")
-    from_email = from_email or os.getenv("FROM_EMAIL") or smtp_user
-
-    if not smtp_host or not smtp_port:
+    if not pool.smtp_host or not pool.smtp_port:
         return {"ok": False, "error": "SMTP host/port not configured."}
 
-    # Build message
-    msg = MIMEMultipart()
+    # Build message (single plain-text part, no multipart wrapper)
+    msg = EmailMessage()
     msg["From"] = from_email
     msg["To"] = to_email
     msg["Subject"] = subject
-    msg.attach(MIMEText(body_text, "plain"))
+    msg.set_content(body_text)
 
     try:
-        server = smtplib.SMTP(smtp_host, smtp_port, timeout=15)
-        if use_tls:
-            server.starttls()
-        if smtp_user and smtp_pass:
-            server.login(smtp_user, smtp_pass)
-        server.sendmail(from_email, [to_email], msg.as_string())
-        server.quit()
+        pool.send(msg)
         return {"ok": True, "message": f"Email sent to {to_email}"}
+    except smtplib.SMTPResponseException as e:
+        return {"ok": False, "error": str(e), "code": e.smtp_code, "trace": traceback.format_exc()}
+    except smtplib.SMTPRecipientsRefused as e:
+        # RCPT-time refusals (e.g. 450 mailbox busy) carry the reply per recipient
+        code = e.recipients.get(to_email, (None,))[0]
+        return {"ok": False, "error": str(e), "code": code, "trace": traceback.format_exc()}
     except Exception as e:
         return {"ok": False, "error": str(e), "trace": traceback.format_exc()}
+    finally:
+        if owns_pool:
+            pool.close()
+
+
+# SMTP replies that mean "try again later" (service unavailable / mailbox busy / local error / TLS unavailable)
+RETRYABLE_SMTP_CODES = {421, 450, 451, 454}
+
+
+def send_bulk_emails(messages: List[tuple], concurrency: int = 5,
+                     max_retries: int = 3, backoff: float = 1.0,
+                     from_email: Optional[str] = None,
+                     on_result: Optional[Callable[[int, Dict], None]] = None,
+                     **smtp_settings) -> List[Dict]:
+    """
+    Send (to_email, subject, body_text) tuples over `concurrency` parallel SMTP sessions.
+    Each worker thread keeps its own logged-in SMTPPool (built from smtp_settings, e.g.
+    smtp_host/smtp_user); transient 421/450/451/454 replies are retried with exponential backoff.
+    on_result(index, result) is called from the worker thread as each message finishes.
+    Returns send_email_smtp() results in input order.
+    """
+    local = threading.local()
+    pools = []
+    pools_lock = threading.Lock()
+
+    def worker_pool() -> SMTPPool:
+        if not hasattr(local, "pool"):
+            local.pool = SMTPPool(**smtp_settings)
+            with pools_lock:
+                pools.append(local.pool)
+        return local.pool
+
+    def send_one(indexed: tuple) -> Dict:
+        index, (to_email, subject, body_text) = indexed
+        pool = worker_pool()
+        for attempt in range(max_retries + 1):
+            result = send_email_smtp(to_email, subject, body_text, from_email=from_email, pool=pool)
+            if result.get("ok") or result.get("code") not in RETRYABLE_SMTP_CODES or attempt == max_retries:
+                break
+            time.sleep(backoff * 2 ** attempt)
+        if on_result:
+            on_result(index, result)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            return list(executor.map(send_one, enumerate(messages)))
+    finally:
+        for pool in pools:
+            pool.close()
 
 
 # -------------------------
@@ -176,11 +325,14 @@ def onboard_selected_candidates(screening_results: List[Dict],
                                 default_start_date: Optional[str] = None,
                                 send_email: bool = True,
                                 email_subject_template: Optional[str] = None,
-                                email_body_template: Optional[str] = None) -> List[Dict]:
+                                email_body_template: Optional[str] = None,
+                                concurrency: int = 5) -> List[Dict]:
     """
     Given screening_results (list of dicts), find PASS candidates, generate onboarding plan,
     and optionally send emails. Returns list of status dicts for each candidate processed.
     Expected screening_result item keys: 'filename', 'verdict', optionally 'email' or 'contact'.
+    All plans are generated concurrently first; emails then go out over `concurrency`
+    parallel SMTP sessions.
     """
     processed = []
     for item in screening_results:
@@ -198,8 +350,32 @@ def onboard_selected_candidates(screening_results: List[Dict],
             if not candidate_email:
                 candidate_email = guess_email_from_filename(filename)
 
-            # build onboarding plan
-            plan_text = generate_onboarding_plan_text(name_guess, role, default_start_date)
+            processed.append({
+                "filename": filename,
+                "name": name_guess,
+                "email": candidate_email,
+                "role": role,
+                "plan": None,
+                "email_status": None,
+                "status": "plan_generated"
+            })
+
+        except Exception as e:
+            processed.append({
+                "filename": item.get("filename", "unknown"),
+                "status": "error",
+                "error": str(e)
+            })
+
+    # build all onboarding plans concurrently before any email goes out
+    selected = [r for r in processed if r["status"] == "plan_generated"]
+    plans = asyncio.run(generate_onboarding_plans([(r["name"], r["role"]) for r in selected], default_start_date))
+
+    outbox = []  # (status record, to_email, subject, body)
+    for record, plan_text in zip(selected, plans):
+        try:
+            name_guess, role = record["name"], record["role"]
+            record["plan"] = plan_text
 
             # build email
             subject = email_subject_template or f"Onboarding: Welcome to {role} at Company"
@@ -214,29 +390,20 @@ def onboard_selected_candidates(screening_results: List[Dict],
                         "Please reply to confirm your availability and if you have any questions.\n\n"
                         "Best,\nHR Team")
 
-            send_result = None
             if send_email:
-                send_result = send_email_smtp(candidate_email, subject, body)
-                status = "email_sent" if send_result.get("ok") else "email_failed"
-            else:
-                status = "plan_generated"
-
-            processed.append({
-                "filename": filename,
-                "name": name_guess,
-                "email": candidate_email,
-                "role": role,
-                "plan": plan_text,
-                "email_status": send_result,
-                "status": status
-            })
+                outbox.append((record, record["email"], subject, body))
 
         except Exception as e:
-            processed.append({
-                "filename": item.get("filename", "unknown"),
-                "status": "error",
-                "error": str(e)
-            })
+            filename = record["filename"]
+            record.clear()
+            record.update({"filename": filename, "status": "error", "error": str(e)})
+
+    if outbox:
+        send_results = send_bulk_emails([(to, subject, body) for _, to, subject, body in outbox],
+                                        concurrency=concurrency)
+        for (record, *_), send_result in zip(outbox, send_results):
+            record["email_status"] = send_result
+            record["status"] = "email_sent" if send_result.get("ok") else "email_failed"
 
     return processed
 
@@ -1,31 +1,133 @@
 import os
+import threading
+from functools import lru_cache
+import numpy as np
 from openai import OpenAI
 from dotenv import load_dotenv
+from Agents.embeddings import embed_texts
 
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+POLICY_PATH = os.path.join("knowledge", "policy.txt")
+
+# Answer cache: exact (normalized question) tier, then semantic tier over question embeddings.
+# Persisted to disk and invalidated whenever policy.txt changes.
+ANSWER_CACHE_PATH = os.path.join("knowledge", "policy_answer_cache.npz")
+SEMANTIC_THRESHOLD = 0.92  # cosine similarity needed to reuse another question's answer
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_policy(mtime):
+    # mtime is only the cache key, so edits to policy.txt are picked up
+    with open(POLICY_PATH, "r") as f:
+        return f.read()
+
+
 def answer_policy_question(question):
-    policy_path = os.path.join("knowledge", "policy.txt")
-    if not os.path.exists(policy_path):
+    if not os.path.exists(POLICY_PATH):
         return "⚠️ Policy file not found."
 
-    with open(policy_path, "r") as f:
-        policy_text = f.read()
+    policy_text = _load_policy(os.path.getmtime(POLICY_PATH))
 
-    prompt = f"""
+    # Static policy block goes first so the provider can cache the prompt prefix
+    system_prompt = f"""
 You are an HR policy assistant.
 Refer only to this company policy text and answer truthfully.
+If the answer isn’t covered, reply "Not covered in current policy."
 
 Policy:
 \"\"\"{policy_text}\"\"\"
-
-Question: {question}
-
-If the answer isn’t covered, reply "Not covered in current policy."
 """
     try:
-        response = client.responses.create(model="gpt-4o-mini", input=prompt, temperature=0.2)
+        response = client.responses.create(
+            model="gpt-4o-mini",
+            input=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Question: {question}"},
+            ],
+            temperature=0.2,
+        )
         return response.output_text.strip()
     except Exception as e:
         return f"Error answering policy: {e}"
+
+
+def _normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+def _load_answer_cache(policy_mtime):
+    global _answer_cache
+    if _answer_cache is None:
+        try:
+            # plain arrays only (allow_pickle=False) — nothing executable is read back from disk
+            with np.load(ANSWER_CACHE_PATH, allow_pickle=False) as data:
+                _answer_cache = {
+                    "policy_mtime": float(data["policy_mtime"]),
+                    "exact": dict(zip(data["exact_keys"].tolist(), data["exact_answers"].tolist())),
+                    "embeddings": list(data["embeddings"]),
+                    "answers": data["answers"].tolist(),
+                }
+        except Exception:
+            _answer_cache = None  # missing, corrupt or incompatible file — start a fresh cache
+    if _answer_cache is None or _answer_cache.get("policy_mtime") != policy_mtime:
+        _answer_cache = {"policy_mtime": policy_mtime, "exact": {}, "embeddings": [], "answers": []}
+    return _answer_cache
+
+
+def _save_answer_cache():
+    try:
+        with open(ANSWER_CACHE_PATH, "wb") as f:
+            np.savez(
+                f,
+                policy_mtime=np.float64(_answer_cache["policy_mtime"]),
+                exact_keys=np.array(list(_answer_cache["exact"]), dtype=str),
+                exact_answers=np.array(list(_answer_cache["exact"].values()), dtype=str),
+                embeddings=np.array(_answer_cache["embeddings"], dtype=np.float32),
+                answers=np.array(_answer_cache["answers"], dtype=str),
+            )
+    except OSError:
+        pass
+
+
+def cached_answer_policy_question(question):
+    """
+    answer_policy_question() behind an exact + semantic cache.
+    Repeated or near-duplicate questions (cosine >= SEMANTIC_THRESHOLD) skip the LLM.
+    """
+    if not os.path.exists(POLICY_PATH):
+        return answer_policy_question(question)
+
+    key = _normalize_question(question)
+    with _answer_cache_lock:
+        cache = _load_answer_cache(os.path.getmtime(POLICY_PATH))
+        if key in cache["exact"]:
+            return cache["exact"][key]
+        embeddings, answers = list(cache["embeddings"]), list(cache["answers"])
+
+    try:
+        emb = embed_texts([key])[0]
+    except Exception:
+        emb = None  # embedding unavailable — fall through to a normal answer
+
+    if emb is not None and embeddings:
+        sims = np.vstack(embeddings) @ emb
+        best = int(np.argmax(sims))
+        if sims[best] >= SEMANTIC_THRESHOLD:
+            return answers[best]
+
+    answer = answer_policy_question(question)
+    if answer.startswith("Error answering policy"):
+        return answer  # never cache failures
+
+    with _answer_cache_lock:
+        cache["exact"][key] = answer
+        if emb is not None:
+            cache["embeddings"].append(emb)
+            cache["answers"].append(answer)
+        _save_answer_cache()
+    return answer
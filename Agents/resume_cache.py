@@ -0,0 +1,64 @@
+"""
+Agents/resume_cache.py
+
+Content-hash cache for resume screening LLM results.
+Keyed on sha256(version + role + resume text), so re-screening an identical resume for
+the same role returns the stored JSON instead of calling OpenAI again. `version` names the
+model and prompt revision; changing it makes older entries unreachable.
+
+Environment variables (optional):
+- RESUME_CACHE       set to "0" / "false" to disable (enabled by default)
+- RESUME_CACHE_PATH  SQLite file location (default: knowledge/resume_cache.sqlite3)
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+from contextlib import closing
+from typing import Optional
+
+CACHE_ENABLED = os.getenv("RESUME_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+CACHE_PATH = os.getenv("RESUME_CACHE_PATH", os.path.join("knowledge", "resume_cache.sqlite3"))
+
+
+def cache_key(role: str, resume_text: str, version: str) -> str:
+    return hashlib.sha256(f"{version}\0{role.strip().lower()}\0{resume_text}".encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    # a short-lived connection per call keeps this safe to use from worker threads
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS llm_results (key TEXT PRIMARY KEY, output TEXT NOT NULL)")
+    return conn
+
+
+def get_cached(role: str, resume_text: str, version: str) -> Optional[str]:
+    """Return the stored LLM output for this role/resume/version, or None."""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        with closing(_connect()) as conn, conn:
+            row = conn.execute("SELECT output FROM llm_results WHERE key = ?",
+                               (cache_key(role, resume_text, version),)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+def store(role: str, resume_text: str, version: str, llm_output: str) -> None:
+    """Cache llm_output only if it is a usable verdict, so bad replies are retried next time."""
+    if not CACHE_ENABLED:
+        return
+    try:
+        parsed = json.loads(llm_output)
+    except (TypeError, json.JSONDecodeError):
+        return
+    if not isinstance(parsed, dict) or "verdict" not in parsed:
+        return
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO llm_results (key, output) VALUES (?, ?)",
+                         (cache_key(role, resume_text, version), llm_output))
+    except sqlite3.Error:
+        pass
@@ -1,48 +1,222 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import tesserocr  # optional: in-process Tesseract bindings (no subprocess/model load per page)
+except ImportError:
+    tesserocr = None
+
+OCR_CONFIG = "--oem 1 --psm 6"  # LSTM engine, single uniform text block (pytesseract fallback)
+
+_ocr_local = threading.local()
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+# OCR helpers live at module scope so worker processes can unpickle them
+def ocr_image(img):
+    """OCR one page image, reusing this thread's tesserocr API when tesserocr is installed."""
+    if tesserocr is None:
+        import pytesseract
+        return pytesseract.image_to_string(img, config=OCR_CONFIG)
+    api = getattr(_ocr_local, "api", None)
+    if api is None:
+        api = _ocr_local.api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.LSTM_ONLY)
+    api.SetImage(img)
+    return api.GetUTF8Text()
+
+
+def get_ocr_pool():
+    """Process pool shared across resumes, so OCR workers keep their loaded model between PDFs."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # never fork the threaded Streamlit server — workers start from a clean forkserver (spawn on Windows)
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _ocr_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                            mp_context=multiprocessing.get_context(method))
+        return _ocr_pool
+
+
+def ocr_images(imgs):
+    """OCR page images on the shared pool; if a worker died (crash/OOM), rebuild the pool and retry once."""
+    global _ocr_pool
+    for attempt in range(2):
+        pool = get_ocr_pool()
+        try:
+            return list(pool.map(ocr_image, imgs))
+        except BrokenProcessPool:
+            with _ocr_pool_lock:
+                if _ocr_pool is pool:
+                    _ocr_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            if attempt:
+                raise
+
+
 def run():
     import streamlit as st
-    import pandas as pd
     import json
-    from io import BytesIO
-    from openpyxl import load_workbook
-    from openpyxl.styles import PatternFill, Font
-    from openai import OpenAI
+    import asyncio
+    import hashlib
+    import zipfile
+    import xml.etree.ElementTree as ET
+    from concurrent.futures import ThreadPoolExecutor
+    from openai import OpenAI, AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
     import pdfplumber
-    from pdf2image import convert_from_bytes
-    import pytesseract
-    from PIL import Image
-    import docx
+    from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+    from Agents import resume_cache
 
     # ----------------- SETUP -----------------
     st.set_page_config(page_title="AI Resume Screener", page_icon="🤖", layout="centered")
     client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    MAX_CONCURRENT_LLM_CALLS = 20  # in-flight OpenAI requests per batch
+    RESUMES_PER_PROMPT = 5  # resumes packed into one request in HR Manager mode
+    EXTRACTION_WORKERS = 8  # threads parsing PDFs/DOCX while LLM calls are in flight
+    MAX_RESUME_CHARS = 8000  # only this much resume text is ever sent to the LLM
+    OCR_PAGES_PER_RUN = 4  # pages rasterized per pdftoppm call when OCR is needed
+    LLM_MODEL = "gpt-4o-mini"
+    PROMPT_VERSION = 2  # bump when the scoring prompt, weights or verdict schema change
+    CACHE_VERSION = f"{LLM_MODEL}:{PROMPT_VERSION}"  # cached verdicts are only reused for the same model + prompt
+
+    # Structured outputs: the model must return exactly these fields
+    VERDICT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "weighted_average": {"type": "number"},
+            "verdict": {"type": "string", "enum": ["PASS", "FAIL"]},
+            "reasoning": {"type": "string"},
+        },
+        "required": ["weighted_average", "verdict", "reasoning"],
+        "additionalProperties": False,
+    }
+    # grouped entries carry the 1-based resume number from the prompt, so they are matched by id, not position
+    GROUP_ITEM_SCHEMA = {
+        **VERDICT_SCHEMA,
+        "properties": {"resume": {"type": "integer"}, **VERDICT_SCHEMA["properties"]},
+        "required": ["resume", *VERDICT_SCHEMA["required"]],
+    }
+    GROUP_VERDICT_SCHEMA = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": GROUP_ITEM_SCHEMA}},
+        "required": ["results"],
+        "additionalProperties": False,
+    }
+
+    # Transient API errors and unparseable replies are retried with jittered exponential backoff
+    TRANSPORT_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+    llm_retry = retry(
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(4),
+        retry=retry_if_exception_type(TRANSPORT_ERRORS + (json.JSONDecodeError,)),
+        reraise=True,
+    )
+    # Grouped requests only retry transport errors — bad entries are rescored one by one instead
+    transport_retry = retry(
+        wait=wait_random_exponential(min=1, max=30),
+        stop=stop_after_attempt(4),
+        retry=retry_if_exception_type(TRANSPORT_ERRORS),
+        reraise=True,
+    )
 
     # ----------------- TEXT EXTRACTION -----------------
-    def extract_text_from_pdf(file):
-        text = ""
+    # Extractors stop as soon as max_chars are collected — the rest would be truncated anyway
+    def page_runs(pages, max_run=OCR_PAGES_PER_RUN):
+        """Split sorted page indices into runs of adjacent pages, at most max_run long."""
+        runs = []
+        for i in pages:
+            if runs and i == runs[-1][-1] + 1 and len(runs[-1]) < max_run:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        return runs
+
+    def extract_text_from_pdf(file, max_chars=MAX_RESUME_CHARS):
+        # Digital text per page; only pages without a text layer are OCR'd.
+        # Page texts are collected in a list and joined once (no quadratic +=).
+        # The max_chars budget is counted in page order, so a scanned page 1 ahead of
+        # digital pages is still OCR'd even when the later pages alone fill the budget.
+        page_texts, missing, total = [], [], 0
         try:
             with pdfplumber.open(file) as pdf:
-                for p in pdf.pages:
-                    t = p.extract_text()
-                    if t:
-                        text += t + "\n"
+                for i, p in enumerate(pdf.pages):
+                    t = p.extract_text() or ""
+                    p.flush_cache()
+                    page_texts.append(t)
+                    if t.strip():
+                        total += len(t) + 1
+                    else:
+                        missing.append(i)
+                    if total >= max_chars:
+                        break
         except Exception:
-            pass
-        if not text.strip():
+            page_texts, missing = [], None  # pdfplumber can't read it — OCR the whole file
+
+        if missing is None or missing:
             try:
                 file.seek(0)
-                imgs = convert_from_bytes(file.read())
-                for img in imgs:
-                    text += pytesseract.image_to_string(img)
+                data = file.read()
+                if missing is None:
+                    page_count = pdfinfo_from_bytes(data)["Pages"]
+                    missing = list(range(page_count))
+                    page_texts = [""] * page_count
+                # one pdftoppm launch per run of adjacent pages (a scanned resume is usually a single run),
+                # rasterized chunk by chunk so the max_chars cut-off also skips rasterizing later pages.
+                # Every missing page lies before the pdfplumber cut-off, so each one is needed until
+                # the text of all pages up to the last OCR'd one fills the budget.
+                for pages in page_runs(missing):
+                    imgs = convert_from_bytes(data, first_page=pages[0] + 1, last_page=pages[-1] + 1)
+                    if len(imgs) > 1:
+                        # OCR is CPU-bound — spread pages across the shared worker processes
+                        texts = ocr_images(imgs)
+                    else:
+                        texts = [ocr_image(img) for img in imgs]
+                    for i, t in zip(pages, texts):
+                        page_texts[i] = t
+                    if sum(len(t) + 1 for t in page_texts[:pages[-1] + 1] if t.strip()) >= max_chars:
+                        break
             except Exception:
-                text = ""
-        return text.strip()
+                pass  # keep whatever digital text we already have
+        return "\n".join(t for t in page_texts if t.strip()).strip()[:max_chars]
+
+    def extract_text_from_docx(file, max_chars=MAX_RESUME_CHARS):
+        # Stream word/document.xml and keep <w:t> text plus tabs/line breaks, one line per <w:p>
+        paragraphs, runs = [], []
+        total = 0
+        with zipfile.ZipFile(file) as z, z.open("word/document.xml") as f:
+            for _, el in ET.iterparse(f):
+                if el.tag.endswith("}t"):
+                    runs.append(el.text or "")
+                elif el.tag.endswith("}tab") and not el.attrib:
+                    # run-level tab; tab-stop definitions in <w:tabs> always carry w:val/w:pos
+                    runs.append("\t")
+                elif el.tag.endswith("}br") or el.tag.endswith("}cr"):
+                    runs.append("\n")
+                elif el.tag.endswith("}p"):
+                    paragraph = "".join(runs)
+                    paragraphs.append(paragraph)
+                    runs = []
+                    el.clear()
+                    total += len(paragraph) + 1
+                    if total >= max_chars:
+                        break
+        return "\n".join(paragraphs)[:max_chars]
+
+    def extract_text(file, max_chars=MAX_RESUME_CHARS):
+        if file.name.endswith(".pdf"):
+            return extract_text_from_pdf(file, max_chars)
+        return extract_text_from_docx(file, max_chars)
 
-    def extract_text_from_docx(file):
-        doc = docx.Document(file)
-        return "\n".join(p.text for p in doc.paragraphs)
+    def text_hash(text):
+        # identical extracted text => same resume, even under a different filename
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
 
     # ----------------- LLM ANALYSIS -----------------
-    def analyze_resume_with_llm(role, resume_text):
+    def build_messages(role, resume_text):
         prompt = f"""
 You are an expert HR recruiter assistant.
 Candidate is applying for {role}.
@@ -54,27 +228,316 @@ Below is their resume text.
 4. Return JSON only:
 {{"weighted_average": float, "verdict": "PASS"/"FAIL", "reasoning": "string"}}
 """
+        return [
+            {"role": "system", "content": "Return valid JSON only."},
+            {"role": "user", "content": prompt + "\nResume:\n" + resume_text[:MAX_RESUME_CHARS]},
+        ]
+
+    def error_output(e):
+        return json.dumps({"weighted_average": 0, "verdict": "FAIL", "reasoning": f"Error: {e}"})
+
+    def text_format(name, schema):
+        # Responses API: text={"format": ...}
+        return {"format": {"type": "json_schema", "name": name, "schema": schema, "strict": True}}
+
+    def response_format(name, schema):
+        # Chat Completions / Batch API: response_format=...
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+
+    def complete(messages, name="resume_verdict", schema=VERDICT_SCHEMA):
         try:
             resp = client.responses.create(
-                model="gpt-4o-mini",
-                input=[
-                    {"role": "system", "content": "Return valid JSON only."},
-                    {"role": "user", "content": prompt + "\nResume:\n" + resume_text[:8000]},
-                ],
-                response_format={"type": "json_object"},
+                model=LLM_MODEL,
+                input=messages,
+                text=text_format(name, schema),
             )
             return resp.output_text
         except TypeError:
             chat = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "Return valid JSON only."},
-                    {"role": "user", "content": prompt + "\nResume:\n" + resume_text[:8000]},
-                ],
+                model=LLM_MODEL,
+                messages=messages,
+                response_format=response_format(name, schema),
             )
             return chat.choices[0].message.content
+
+    def check_output(llm_output):
+        # schemas make this a safety net (e.g. truncated/refused replies); raises so llm_retry asks again
+        if not isinstance(json.loads(llm_output), dict):
+            raise json.JSONDecodeError("Expected a JSON object", llm_output, 0)
+
+    @llm_retry
+    def analyze_once(role, resume_text):
+        llm_output = complete(build_messages(role, resume_text))
+        check_output(llm_output)
+        return llm_output
+
+    def analyze_resume_with_llm(role, resume_text):
+        cached = resume_cache.get_cached(role, resume_text, CACHE_VERSION)
+        if cached is not None:
+            return cached
+        try:
+            llm_output = analyze_once(role, resume_text)
         except Exception as e:
-            return json.dumps({"weighted_average": 0, "verdict": "FAIL", "reasoning": f"Error: {e}"})
+            return error_output(e)
+        resume_cache.store(role, resume_text, CACHE_VERSION, llm_output)
+        return llm_output
+
+    def build_group_messages(role, resume_texts):
+        prompt = f"""
+You are an expert HR recruiter assistant.
+Each candidate below is applying for {role}.
+You will receive {len(resume_texts)} resumes, numbered 1 to {len(resume_texts)}.
+
+For EACH resume:
+1. Extract: Age, Education, Skills, Projects, Certifications.
+2. Score each (0–10) for relevance to {role}.
+3. Compute weighted average: Skills40 + Projects30 + Education20 + Certs10.
+
+Return JSON only, with exactly one entry per resume; "resume" is the resume's number:
+{{"results": [{{"resume": int, "weighted_average": float, "verdict": "PASS"/"FAIL", "reasoning": "string"}}, ...]}}
+"""
+        resumes = "".join(f"\nResume {i}:\n{text[:MAX_RESUME_CHARS]}\n" for i, text in enumerate(resume_texts, 1))
+        return [
+            {"role": "system", "content": "Return valid JSON only."},
+            {"role": "user", "content": prompt + resumes},
+        ]
+
+    def split_group_output(llm_output, count):
+        """
+        Distribute a grouped response back to one JSON string per resume, matched by "resume" number.
+        Unless the numbers are exactly 1..count, every entry becomes "" and is rescored individually —
+        a skipped or repeated entry would otherwise shift verdicts onto the wrong candidates.
+        """
+        try:
+            data = json.loads(llm_output)
+        except (TypeError, json.JSONDecodeError):
+            return [""] * count
+        items = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) and isinstance(item.get("resume"), int) for item in items
+        ):
+            return [""] * count
+        by_number = {item.get("resume"): item for item in items}
+        if len(items) != count or set(by_number) != set(range(1, count + 1)):
+            return [""] * count
+        return [
+            json.dumps({k: v for k, v in by_number[n].items() if k != "resume"})
+            for n in range(1, count + 1)
+        ]
+
+    async def complete_async(async_client, sem, messages, name="resume_verdict", schema=VERDICT_SCHEMA):
+        async with sem:
+            try:
+                resp = await async_client.responses.create(
+                    model=LLM_MODEL,
+                    input=messages,
+                    text=text_format(name, schema),
+                )
+                return resp.output_text
+            except TypeError:
+                chat = await async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=messages,
+                    response_format=response_format(name, schema),
+                )
+                return chat.choices[0].message.content
+
+    def is_valid_output(llm_output):
+        try:
+            check_output(llm_output)
+        except (TypeError, json.JSONDecodeError):
+            return False
+        return True
+
+    @llm_retry
+    async def analyze_single_async(async_client, sem, role, resume_text):
+        llm_output = await complete_async(async_client, sem, build_messages(role, resume_text))
+        check_output(llm_output)
+        return llm_output
+
+    @transport_retry
+    async def analyze_group_once(async_client, sem, role, resume_texts):
+        llm_output = await complete_async(async_client, sem, build_group_messages(role, resume_texts),
+                                          name="resume_verdicts", schema=GROUP_VERDICT_SCHEMA)
+        return split_group_output(llm_output, len(resume_texts))
+
+    async def analyze_resumes_batch(async_client, sem, role, resume_texts):
+        # cache hits skip the LLM; only the misses are sent (grouped if more than one)
+        outputs = [resume_cache.get_cached(role, t, CACHE_VERSION) for t in resume_texts]
+        misses = [i for i, o in enumerate(outputs) if o is None]
+        if not misses:
+            return outputs
+
+        texts = [resume_texts[i] for i in misses]
+        fresh = [""] * len(texts)
+        if len(texts) > 1:
+            try:
+                fresh = await analyze_group_once(async_client, sem, role, texts)
+            except Exception:
+                pass  # e.g. a BadRequestError caused by one resume — score every resume on its own
+
+        # keep the entries the group got right (matched by resume number); the rest are scored on their own
+        bad = [j for j, llm_output in enumerate(fresh) if not is_valid_output(llm_output)]
+        singles = await asyncio.gather(
+            *(analyze_single_async(async_client, sem, role, texts[j]) for j in bad), return_exceptions=True
+        )
+        failed = set()  # indices holding error_output (never cached)
+        for j, single in zip(bad, singles):
+            if isinstance(single, Exception):
+                fresh[j] = error_output(single)
+                failed.add(j)
+            else:
+                fresh[j] = single
+
+        for j, (text, llm_output) in enumerate(zip(texts, fresh)):
+            if j not in failed:
+                resume_cache.store(role, text, CACHE_VERSION, llm_output)
+            outputs[misses[j]] = llm_output
+        return outputs
+
+    # ----------------- CONCURRENT BATCH -----------------
+    async def run_batch(files, role, group_size=RESUMES_PER_PROMPT, on_done=None):
+        """
+        Extract + analyze all files concurrently, group_size resumes per LLM request.
+        Extraction runs in a thread pool and feeds a queue; groups are sent to the LLM
+        as soon as they fill up, so parsing overlaps with network latency.
+        Duplicate resumes (same extracted text) are analyzed once and the result is copied.
+        Returns (file, text, llm_output) tuples in upload order; llm_output is None for empty text.
+        """
+        loop = asyncio.get_running_loop()
+        sem = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+        queue = asyncio.Queue()
+        texts = [""] * len(files)
+        outputs = [None] * len(files)
+        leaders = {}  # text hash -> index of the first file with that text
+        duplicates = {}  # index -> leader index
+
+        async with AsyncOpenAI(api_key=st.secrets["OPENAI_API_KEY"]) as async_client:
+            with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as pool:
+                async def extract(i, file):
+                    try:
+                        text = await loop.run_in_executor(pool, extract_text, file)
+                    except Exception:
+                        text = ""  # treated like an unreadable file
+                    await queue.put((i, text))
+
+                async def analyze(indices):
+                    llm_outputs = await analyze_resumes_batch(async_client, sem, role, [texts[i] for i in indices])
+                    for i, llm_output in zip(indices, llm_outputs):
+                        outputs[i] = llm_output
+                        if on_done:
+                            on_done(files[i])
+
+                producers = [asyncio.create_task(extract(i, f)) for i, f in enumerate(files)]
+                llm_tasks, pending = [], []
+                for _ in files:
+                    i, text = await queue.get()
+                    texts[i] = text
+                    if not text.strip():
+                        if on_done:
+                            on_done(files[i])
+                        continue
+                    h = text_hash(text)
+                    if h in leaders:
+                        duplicates[i] = leaders[h]
+                        continue
+                    leaders[h] = i
+                    pending.append(i)
+                    if len(pending) == group_size:
+                        llm_tasks.append(asyncio.create_task(analyze(pending)))
+                        pending = []
+                if pending:
+                    llm_tasks.append(asyncio.create_task(analyze(pending)))
+
+                await asyncio.gather(*producers, *llm_tasks)
+
+        for i, leader in duplicates.items():
+            outputs[i] = outputs[leader]
+            if on_done:
+                on_done(files[i])
+        return list(zip(files, texts, outputs))
+
+    # ----------------- BATCH API (BULK MODE) -----------------
+    def submit_batch_job(files, role):
+        """
+        Upload one JSONL request per unique readable resume and start an OpenAI Batch API job.
+        Returns (batch_id, unreadable_filenames, duplicates) where duplicates maps a file index
+        to the index whose request it shares; batch_id is None if nothing was readable.
+        """
+        with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as pool:
+            texts = list(pool.map(extract_text, files))
+
+        lines, unreadable = [], []
+        leaders, duplicates = {}, {}
+        for i, (file, text) in enumerate(zip(files, texts)):
+            if not text.strip():
+                unreadable.append(file.name)
+                continue
+            h = text_hash(text)
+            if h in leaders:
+                duplicates[i] = leaders[h]
+                continue
+            leaders[h] = i
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": LLM_MODEL,
+                    "messages": build_messages(role, text),
+                    "response_format": response_format("resume_verdict", VERDICT_SCHEMA),
+                },
+            }))
+
+        if not lines:
+            return None, unreadable, duplicates
+
+        batch_input = client.files.create(file=("resumes.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch_job = client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch_job.id, unreadable, duplicates
+
+    def batch_error_reason(item):
+        # failed requests carry the API error in the response body; batch-level failures in item["error"]
+        body = (item.get("response") or {}).get("body") or {}
+        error = (body.get("error") if isinstance(body, dict) else None) or item.get("error")
+        if isinstance(error, dict):
+            return error.get("message") or error.get("code") or json.dumps(error)
+        return error or "unparseable model reply"
+
+    def parse_batch_output(output_text, filenames, unreadable, duplicates=None, error_text=""):
+        """
+        Turn the batch output file (and the error file, if any) into one result row per filename.
+        error_text holds the lines of batch_job.error_file_id — requests that failed inside the batch.
+        """
+        by_index = {}
+        for line in (output_text + "\n" + error_text).splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response, parsed = item.get("response") or {}, None
+            if response.get("status_code") == 200:
+                try:
+                    parsed = json.loads(response["body"]["choices"][0]["message"]["content"])
+                except (TypeError, KeyError, IndexError, json.JSONDecodeError):
+                    pass
+            if not isinstance(parsed, dict):
+                parsed = {"weighted_average": 0, "verdict": "FAIL",
+                          "reasoning": f"Batch request failed: {batch_error_reason(item)}"}
+            by_index[int(item["custom_id"])] = parsed
+
+        results = []
+        for idx, name in enumerate(filenames):
+            leader = (duplicates or {}).get(idx, idx)
+            if leader in by_index:
+                results.append({**by_index[leader], "filename": name})
+                continue
+            reason = "Unreadable or empty resume text." if name in unreadable else "No result returned by batch job."
+            results.append({"filename": name, "weighted_average": 0, "verdict": "FAIL", "reasoning": reason})
+        return results
 
     # ----------------- APP LAYOUT -----------------
     st.title("🤖 AI Resume Screening System")
@@ -93,7 +556,7 @@ Below is their resume text.
         uploaded = st.file_uploader("Upload your resume (PDF or DOCX)", type=["pdf", "docx"])
 
         if uploaded and role:
-            text = extract_text_from_pdf(uploaded) if uploaded.name.endswith(".pdf") else extract_text_from_docx(uploaded)
+            text = extract_text(uploaded)
             st.text_area("📄 Resume Preview:", text[:1000])
 
             if text:
@@ -118,64 +581,82 @@ Below is their resume text.
         st.subheader("🧑‍💼 HR Manager Mode")
         role = st.text_input("Enter the role you are hiring for:")
         uploaded_files = st.file_uploader("Upload multiple resumes", type=["pdf", "docx"], accept_multiple_files=True)
+        bulk_mode = st.checkbox("Bulk (Batch API, cheaper, async)")
 
         if uploaded_files and role:
-            if "results" not in st.session_state or st.session_state.get("last_role") != role:
+            if bulk_mode:
+                # 📦 Submit all resumes as one Batch API job; results are fetched later
+                if st.button("📦 Submit Batch Job"):
+                    try:
+                        with st.spinner(f"Submitting {len(uploaded_files)} resumes to the Batch API..."):
+                            batch_id, unreadable, duplicates = submit_batch_job(uploaded_files, role)
+                        st.session_state.pop("results", None)
+                        st.session_state["batch_id"] = batch_id
+                        st.session_state["batch_files"] = [f.name for f in uploaded_files]
+                        st.session_state["batch_unreadable"] = unreadable
+                        st.session_state["batch_duplicates"] = duplicates
+                        st.session_state["last_role"] = role
+                        if batch_id:
+                            st.success(f"✅ Batch submitted ({batch_id}). Results are usually ready within 24h.")
+                        else:
+                            st.session_state["results"] = parse_batch_output("", st.session_state["batch_files"], unreadable)
+                            st.warning("No readable resumes to submit.")
+                    except Exception as e:
+                        st.error(f"❌ Could not submit batch job: {e}")
+
+                batch_id = st.session_state.get("batch_id")
+                if batch_id and st.button("🔄 Check batch status"):
+                    try:
+                        batch_job = client.batches.retrieve(batch_id)
+                        st.info(f"Batch {batch_id}: {batch_job.status}")
+                        if batch_job.status == "completed":
+                            output_text = client.files.content(batch_job.output_file_id).text if batch_job.output_file_id else ""
+                            error_text = client.files.content(batch_job.error_file_id).text if batch_job.error_file_id else ""
+                            st.session_state["results"] = parse_batch_output(
+                                output_text,
+                                st.session_state.get("batch_files", []),
+                                st.session_state.get("batch_unreadable", []),
+                                st.session_state.get("batch_duplicates", {}),
+                                error_text,
+                            )
+                        elif batch_job.status in ("failed", "expired", "cancelled"):
+                            st.error(f"❌ Batch job ended with status '{batch_job.status}'.")
+                    except Exception as e:
+                        st.error(f"❌ Could not check batch status: {e}")
+
+            elif "results" not in st.session_state or st.session_state.get("last_role") != role:
                 total_files = len(uploaded_files)
                 results = []
-                failed_files = []
 
                 st.info(f"Processing {total_files} resumes for the role of '{role}'...")
                 progress = st.progress(0)
                 status_text = st.empty()
 
-                # 🔹 Pass 1: Initial Analysis
-                for i, file in enumerate(uploaded_files):
-                    with st.spinner(f"Analyzing {file.name} (Pass 1)..."):
-                        text = extract_text_from_pdf(file) if file.name.endswith(".pdf") else extract_text_from_docx(file)
-                        if text.strip():
-                            llm_output = analyze_resume_with_llm(role, text)
-                            try:
-                                parsed = json.loads(llm_output)
-                                parsed["filename"] = file.name
-                                results.append(parsed)
-                            except json.JSONDecodeError:
-                                failed_files.append(file)
-                        else:
-                            failed_files.append(file)
-
-                    progress.progress((i + 1) / total_files)
-                    status_text.text(f"✅ Processed {i + 1}/{total_files} resumes (Pass 1).")
-
-                # 🔁 Pass 2: Retry Failed Resumes Automatically
-                if failed_files:
-                    st.warning(f"⚠️ Retrying {len(failed_files)} failed resumes automatically...")
-                    for j, file in enumerate(failed_files):
-                        with st.spinner(f"Re-analyzing {file.name} (Retry {j+1}/{len(failed_files)})..."):
-                            text = extract_text_from_pdf(file) if file.name.endswith(".pdf") else extract_text_from_docx(file)
-                            if text.strip():
-                                llm_output = analyze_resume_with_llm(role, text)
-                                try:
-                                    parsed = json.loads(llm_output)
-                                    parsed["filename"] = file.name
-                                    results.append(parsed)
-                                    st.success(f"✅ {file.name} parsed successfully on retry.")
-                                except json.JSONDecodeError:
-                                    st.error(f"❌ {file.name} could not be parsed after retry.")
-                                    results.append({
-                                        "filename": file.name,
-                                        "weighted_average": 0,
-                                        "verdict": "FAIL",
-                                        "reasoning": "Resume could not be parsed after two attempts."
-                                    })
-                            else:
-                                st.error(f"❌ {file.name} unreadable (even after retry).")
-                                results.append({
-                                    "filename": file.name,
-                                    "weighted_average": 0,
-                                    "verdict": "FAIL",
-                                    "reasoning": "Unreadable or empty resume text (after retry)."
-                                })
+                # 🔹 Analyze all resumes concurrently (failed calls retry with backoff)
+                processed = 0
+
+                def on_done(file):
+                    nonlocal processed
+                    processed += 1
+                    progress.progress(processed / total_files)
+                    status_text.text(f"✅ Processed {processed}/{total_files} resumes.")
+
+                with st.spinner(f"Analyzing {total_files} resumes..."):
+                    batch = asyncio.run(run_batch(uploaded_files, role, on_done=on_done))
+
+                for file, text, llm_output in batch:
+                    if llm_output is None:
+                        st.error(f"❌ {file.name} unreadable.")
+                        results.append({
+                            "filename": file.name,
+                            "weighted_average": 0,
+                            "verdict": "FAIL",
+                            "reasoning": "Unreadable or empty resume text."
+                        })
+                        continue
+                    parsed = json.loads(llm_output)
+                    parsed["filename"] = file.name
+                    results.append(parsed)
 
                 # 🧾 Save All Results in Session
                 st.session_state["results"] = results
@@ -186,15 +667,16 @@ Below is their resume text.
 
             # ✅ Final Excel Export
             if results:
-                df = pd.DataFrame(results)
-                df = df.sort_values(by="weighted_average", ascending=False)
+                # plain sort — tens/hundreds of rows don't need a DataFrame
+                ranked = sorted(results, key=lambda r: r.get("weighted_average", 0), reverse=True)
+                columns = ["filename", "weighted_average", "verdict", "reasoning"]
 
                 st.success("✅ Screening complete (including retries)!")
-                st.dataframe(df[["filename", "weighted_average", "verdict", "reasoning"]])
+                st.dataframe([{c: r.get(c) for c in columns} for r in ranked])
 
                 # 🧠 Summary info for HR
                 st.info(f"Total resumes processed: {len(uploaded_files)} | Final results: {len(results)}")
 
                 # 🏅 Leaderboard (Top 5)
                 st.subheader("🏅 Top 5 Candidates")
-                top5 = df.head(5)
+                top5 = ranked[:5]
@@ -1,31 +1,74 @@
 import streamlit as st
 import os
+import re
+import csv
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import pandas as pd
+import pyarrow.csv as pa_csv
 import smtplib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
 # ---------------------- SETUP ----------------------
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-email_user = os.getenv("EMAIL_USER")
-email_pass = os.getenv("EMAIL_PASS")
+@st.cache_resource
+def load_env():
+    # Runs once per server process instead of on every Streamlit rerun
+    load_dotenv()
+    return {
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "email_user": os.getenv("EMAIL_USER"),
+        "email_pass": os.getenv("EMAIL_PASS"),
+    }
+
+
+env = load_env()
+api_key = env["api_key"]
+email_user = env["email_user"]
+email_pass = env["email_pass"]
 
 if not api_key:
+    load_env.clear()  # don't keep the incomplete env cached — re-read .env on the next rerun
     st.error("❌ Missing OpenAI API Key. Please set OPENAI_API_KEY in .env or Streamlit Secrets.")
     st.stop()
 
-from Agents.policy_agent import answer_policy_question
+from Agents.policy_agent import cached_answer_policy_question
 from Agents.guardrails import sanitize_input
+from Agents.onboarding_agent import send_bulk_emails
+from Agents.intent_router import build_label_embeddings, classify_intent
 from Agents import resume_screening_app  # ✅ Integrated
 
 # ---------------------- CONSTANTS ----------------------
 LOG_FILE = "onboarding_log.csv"
+LOG_FIELDS = ("Name", "Email", "Date", "Time", "Status", "Mode", "Timestamp")
+RESULT_COLUMNS = ("filename", "email", "verdict", "weighted_average")  # all bulk onboarding reads
+SMTP_SETTINGS = {"smtp_host": "smtp.gmail.com", "smtp_port": 587}
+ONBOARDING_SUBJECT = "🎉 Onboarding Invitation"
+BULK_SMTP_WORKERS = 4  # parallel logged-in SMTP sessions for bulk onboarding
+
+# Intent keywords, matched as substrings (so "resumes"/"onboarding" still hit) in one regex scan each
+RESUME_RE = re.compile(r"resume|screen|candidate|cv", re.IGNORECASE)
+POLICY_RE = re.compile(r"policy|leave|vacation|rules|payroll|salary", re.IGNORECASE)
+ONBOARD_RE = re.compile(r"onboard|joining|orientation|welcome", re.IGNORECASE)
 
 # ---------------------- HELPER: Log each onboarding ----------------------
+@contextmanager
+def onboarding_log_writer():
+    # Append-only, line-buffered; header only when the file is new/empty
+    with open(LOG_FILE, "a", newline="", buffering=1) as f:
+        writer = csv.DictWriter(f, fieldnames=LOG_FIELDS)
+        if f.tell() == 0:
+            writer.writeheader()
+        yield writer
+
+
+_log_buffer = []  # rows waiting for flush_log()
+
+
 def log_onboarding(name, email, date, time, status="Sent", mode="Manual"):
     log_entry = {
         "Name": name,
@@ -37,13 +80,39 @@ def log_onboarding(name, email, date, time, status="Sent", mode="Manual"):
         "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     }
 
-    # Append to CSV
-    if os.path.exists(LOG_FILE):
-        df = pd.read_csv(LOG_FILE)
-        df = pd.concat([df, pd.DataFrame([log_entry])], ignore_index=True)
-    else:
-        df = pd.DataFrame([log_entry])
-    df.to_csv(LOG_FILE, index=False)
+    # Buffered; written to the CSV by flush_log()
+    _log_buffer.append(log_entry)
+
+
+def flush_log():
+    # One append of every buffered row, then clear the buffer
+    if not _log_buffer:
+        return
+    with onboarding_log_writer() as writer:
+        writer.writerows(_log_buffer)
+    _log_buffer.clear()
+
+# ---------------------- HELPER: Read screening results ----------------------
+def read_results_file(uploaded):
+    # Parse only the columns onboarding uses; CSV goes through the Arrow parser.
+    # pyarrow.csv directly (not pd.read_csv(engine="pyarrow")) so quoted multi-line cells,
+    # e.g. LLM reasoning text, can be enabled with newlines_in_values.
+    if uploaded.name.endswith(".csv"):
+        header = next(csv.reader([uploaded.readline().decode("utf-8-sig")]), [])
+        uploaded.seek(0)
+        table = pa_csv.read_csv(
+            uploaded,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(include_columns=[c for c in header if c in RESULT_COLUMNS]),
+        )
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return pd.read_excel(uploaded, usecols=lambda c: c in RESULT_COLUMNS)
+
+# ---------------------- HELPER: Intent prototypes ----------------------
+@st.cache_resource
+def intent_label_embeddings():
+    # embedded once per process; each fallback classification is then one query embedding + 3xD matvec
+    return build_label_embeddings()
 
 # ---------------------- UI CONFIG ----------------------
 st.set_page_config(page_title="AI HR Orchestrator", page_icon="🤖", layout="centered")
@@ -53,9 +122,12 @@ if "mode" not in st.session_state:
     st.session_state.mode = None
 
 # ---------------------- MAIN QUERY ----------------------
-query = st.text_input("What would you like to do? (e.g. 'screen resumes', 'check policy', 'create onboarding plan')")
+# a form, so typing in the box does not rerun the script (and re-route) on every edit
+with st.form("query_form"):
+    query = st.text_input("What would you like to do? (e.g. 'screen resumes', 'check policy', 'create onboarding plan')")
+    submitted = st.form_submit_button("Submit")
 
-if st.button("Submit"):
+if submitted:
     if not query.strip():
         st.warning("Please enter a valid query.")
         st.stop()
@@ -66,16 +138,20 @@ if st.button("Submit"):
         st.error(str(e))
         st.stop()
 
-    q = sanitized_query.lower()
+    q = sanitized_query
 
-    if any(k in q for k in ["resume", "screen", "candidate", "cv"]):
+    if RESUME_RE.search(q):
         st.session_state.mode = "resume"
-    elif any(k in q for k in ["policy", "leave", "vacation", "rules", "payroll", "salary"]):
+    elif POLICY_RE.search(q):
         st.session_state.mode = "policy"
-    elif any(k in q for k in ["onboard", "joining", "orientation", "welcome"]):
+    elif ONBOARD_RE.search(q):
         st.session_state.mode = "onboarding"
     else:
-        st.session_state.mode = "unknown"
+        # no keyword hit — fall back to nearest intent prototype (handles paraphrases)
+        try:
+            st.session_state.mode = classify_intent(q, intent_label_embeddings())
+        except Exception:
+            st.session_state.mode = "unknown"
 
 # ---------------------- DYNAMIC UI ----------------------
 # 1️⃣ Resume Screening
@@ -86,11 +162,13 @@ if st.session_state.mode == "resume":
 # 2️⃣ Policy Question Answering
 elif st.session_state.mode == "policy":
     st.subheader("📜 HR Policy Assistant")
-    question = st.text_input("Ask your HR policy question:")
-    if st.button("Get Policy Answer"):
+    with st.form("policy_form"):
+        question = st.text_input("Ask your HR policy question:")
+        ask_clicked = st.form_submit_button("Get Policy Answer")
+    if ask_clicked:
         if question:
             with st.spinner("Checking policy..."):
-                answer = answer_policy_question(question)
+                answer = cached_answer_policy_question(question)
             st.success(answer)
         else:
             st.warning("Please enter a question.")
@@ -108,16 +186,16 @@ elif st.session_state.mode == "onboarding":
 
         if uploaded_results:
             try:
-                if uploaded_results.name.endswith(".csv"):
-                    df = pd.read_csv(uploaded_results)
-                else:
-                    df = pd.read_excel(uploaded_results)
+                df = read_results_file(uploaded_results)
 
                 if "verdict" not in df.columns:
                     st.error("❌ The uploaded file must include a 'verdict' column.")
                     st.stop()
 
-                passed = df[df["verdict"].astype(str).str.upper() == "PASS"]
+                # Arrow string kernels (utf8_upper + equal) run in C over the whole column;
+                # missing verdicts count as not passed
+                verdict = df["verdict"].astype("string[pyarrow]")
+                passed = df[verdict.str.upper().eq("PASS").fillna(False)]
 
                 if passed.empty:
                     st.warning("No passed candidates found in this file.")
@@ -125,62 +203,82 @@ elif st.session_state.mode == "onboarding":
                     st.success(f"✅ Found {len(passed)} passed candidates!")
                     st.dataframe(passed)
 
-                    start_date = st.date_input("📅 Select Onboarding Date", datetime.now().date() + timedelta(days=2))
-                    start_time = st.time_input("⏰ Select Onboarding Time", datetime.now().time().replace(hour=10, minute=0))
-
-                    email_template = st.text_area(
-                        "📧 Email Message Template",
-                        value=(
-                            "Dear {candidate},\n\n"
-                            "Congratulations! You have been shortlisted for onboarding at our company.\n"
-                            "Please join us on {date} at {time}.\n\n"
-                            "Best Regards,\nHR Team"
-                        ),
-                        height=150,
-                    )
-
-                    if st.button("📨 Send Onboarding Emails"):
+                    with st.form("bulk_form"):
+                        start_date = st.date_input("📅 Select Onboarding Date", datetime.now().date() + timedelta(days=2))
+                        start_time = st.time_input("⏰ Select Onboarding Time", datetime.now().time().replace(hour=10, minute=0))
+
+                        email_template = st.text_area(
+                            "📧 Email Message Template",
+                            value=(
+                                "Dear {candidate},\n\n"
+                                "Congratulations! You have been shortlisted for onboarding at our company.\n"
+                                "Please join us on {date} at {time}.\n\n"
+                                "Best Regards,\nHR Team"
+                            ),
+                            height=150,
+                        )
+                        send_clicked = st.form_submit_button("📨 Send Onboarding Emails")
+
+                    if send_clicked:
                         if not email_user or not email_pass:
                             st.error("Missing email credentials. Please set EMAIL_USER and EMAIL_PASS in your .env file.")
                         else:
                             with st.spinner("Sending onboarding invitations..."):
-                                success, fail = [], []
-                                for _, row in passed.iterrows():
-                                    candidate = row["filename"].split(".")[0]
-                                    to_email = (
-                                        row["email"]
-                                        if "email" in row
-                                        else f"{candidate.lower().replace(' ', '')}@example.com"
+                                success, fail = deque(), deque()
+                                # derive candidate/email columns once (vectorized), then walk plain tuples
+                                passed = passed.copy()
+                                passed["candidate"] = passed["filename"].astype(str).str.split(".", n=1).str[0]
+                                if "email" not in passed.columns:
+                                    passed["email"] = (
+                                        passed["candidate"].str.lower().str.replace(" ", "", regex=False) + "@example.com"
                                     )
 
-                                    msg = MIMEMultipart()
-                                    msg["From"] = email_user
-                                    msg["To"] = to_email
-                                    msg["Subject"] = "🎉 Onboarding Invitation"
+                                # date/time are the same for the whole batch — format them once
+                                date_str = start_date.strftime("%B %d, %Y")
+                                time_str = start_time.strftime("%I:%M %p")
 
-                                    formatted_msg = email_template.format(
-                                        candidate=candidate,
-                                        date=start_date.strftime("%B %d, %Y"),
-                                        time=start_time.strftime("%I:%M %p"),
-                                    )
+                                outbox = []  # (candidate, to_email, body)
+                                for row in passed[["candidate", "email"]].itertuples(index=False):
+                                    body = email_template.format(candidate=row.candidate, date=date_str, time=time_str)
+                                    outbox.append((row.candidate, row.email, body))
 
-                                    msg.attach(MIMEText(formatted_msg, "plain"))
+                                # K worker threads, each logs in once and reuses its SMTP session;
+                                # results are logged as they land and progress is polled from this thread
+                                progress = st.progress(0)
 
-                                    try:
-                                        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-                                            server.starttls()
-                                            server.login(email_user, email_pass)
-                                            server.send_message(msg)
+                                def record_result(i, result):
+                                    candidate, to_email, _ = outbox[i]
+                                    if result.get("ok"):
                                         success.append(candidate)
                                         log_onboarding(candidate, to_email, start_date, start_time, "Sent", "Bulk")
-                                    except Exception as e:
+                                    else:
+                                        e = result.get("error")
                                         fail.append((candidate, str(e)))
                                         log_onboarding(candidate, to_email, start_date, start_time, f"Failed: {e}", "Bulk")
 
+                                try:
+                                    with ThreadPoolExecutor(max_workers=1) as runner:
+                                        sending = runner.submit(
+                                            send_bulk_emails,
+                                            [(to_email, ONBOARDING_SUBJECT, body) for _, to_email, body in outbox],
+                                            concurrency=BULK_SMTP_WORKERS,
+                                            from_email=email_user,
+                                            on_result=record_result,
+                                            smtp_user=email_user,
+                                            smtp_pass=email_pass,
+                                            **SMTP_SETTINGS,
+                                        )
+                                        while not wait([sending], timeout=0.2).done:
+                                            progress.progress((len(success) + len(fail)) / max(len(outbox), 1))
+                                        sending.result()
+                                    progress.progress(1.0)
+                                finally:
+                                    flush_log()  # whole batch written in one append
+
                                 st.success(f"✅ Emails sent successfully to {len(success)} candidates.")
                                 if fail:
                                     st.error(f"❌ Failed to send {len(fail)} emails.")
-                                    st.json(fail)
+                                    st.json(list(fail))
 
             except Exception as e:
                 st.error(f"Error processing file: {e}")
@@ -189,23 +287,26 @@ elif st.session_state.mode == "onboarding":
     elif onboarding_mode == "🧍 Manual Entry":
         st.markdown("Enter onboarding details for a single candidate:")
 
-        candidate_name = st.text_input("Candidate Name:")
-        candidate_email = st.text_input("Candidate Email:")
-        start_date = st.date_input("📅 Onboarding Date", datetime.now().date() + timedelta(days=2))
-        start_time = st.time_input("⏰ Onboarding Time", datetime.now().time().replace(hour=10, minute=0))
-
-        email_template = st.text_area(
-            "📧 Email Message Template",
-            value=(
-                "Dear {candidate},\n\n"
-                "Congratulations! You have been shortlisted for onboarding at our company.\n"
-                "Please join us on {date} at {time}.\n\n"
-                "Best Regards,\nHR Team"
-            ),
-            height=150,
-        )
-
-        if st.button("📨 Send Onboarding Email"):
+        # inputs are batched in a form: editing them no longer reruns the script until Send is pressed
+        with st.form("manual_form"):
+            candidate_name = st.text_input("Candidate Name:")
+            candidate_email = st.text_input("Candidate Email:")
+            start_date = st.date_input("📅 Onboarding Date", datetime.now().date() + timedelta(days=2))
+            start_time = st.time_input("⏰ Onboarding Time", datetime.now().time().replace(hour=10, minute=0))
+
+            email_template = st.text_area(
+                "📧 Email Message Template",
+                value=(
+                    "Dear {candidate},\n\n"
+                    "Congratulations! You have been shortlisted for onboarding at our company.\n"
+                    "Please join us on {date} at {time}.\n\n"
+                    "Best Regards,\nHR Team"
+                ),
+                height=150,
+            )
+            send_clicked = st.form_submit_button("📨 Send Onboarding Email")
+
+        if send_clicked:
             if not (candidate_name and candidate_email):
                 st.warning("Please enter both candidate name and email.")
             elif not email_user or not email_pass:
@@ -215,7 +316,7 @@ elif st.session_state.mode == "onboarding":
                     msg = MIMEMultipart()
                     msg["From"] = email_user
                     msg["To"] = candidate_email
-                    msg["Subject"] = "🎉 Onboarding Invitation"
+                    msg["Subject"] = ONBOARDING_SUBJECT
 
                     formatted_msg = email_template.format(
                         candidate=candidate_name,
@@ -232,9 +333,11 @@ elif st.session_state.mode == "onboarding":
                             server.send_message(msg)
                         st.success(f"✅ Email sent successfully to {candidate_name} ({candidate_email})!")
                         log_onboarding(candidate_name, candidate_email, start_date, start_time, "Sent", "Manual")
+                        flush_log()
                     except Exception as e:
                         st.error(f"❌ Failed to send email: {e}")
                         log_onboarding(candidate_name, candidate_email, start_date, start_time, f"Failed: {e}", "Manual")
+                        flush_log()
 
 # 4️⃣ Unknown Queries
 elif st.session_state.mode == "unknown":